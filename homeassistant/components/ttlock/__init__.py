@@ -0,0 +1 @@
+"""The ttlock component."""
@@ -0,0 +1,430 @@
+"""Support for TTLock smart locks."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import time
+from typing import Any
+
+import aiohttp
+import voluptuous as vol
+
+from homeassistant.components.lock import PLATFORM_SCHEMA, LockEntity
+from homeassistant.const import (
+    ATTR_BATTERY_LEVEL,
+    ATTR_MODEL,
+    ATTR_SW_VERSION,
+    CONF_CLIENT_ID,
+    CONF_CLIENT_SECRET,
+    CONF_DOMAIN,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.json import json_loads
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+from homeassistant.helpers.update_coordinator import (
+    CoordinatorEntity,
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DOMAIN = "ttlock"
+
+ATTR_ALIAS = "alias"
+ATTR_AUTO_LOCK_TIME = "auto_lock_time"
+ATTR_LAST_ENTRY_TIME = "last_entry_time"
+ATTR_LAST_USER = "last_user"
+ATTR_LOCK_ID = "lock_id"
+ATTR_LOCK_SOUND = "lock_sound"
+ATTR_PASSAGE_MODE = "passage_mode"
+ATTR_PRIVACY_LOCK = "privacy_lock"
+ATTR_RESET_BUTTON = "reset_button"
+ATTR_TAMPER_ALERT = "tamper_alert"
+
+CONF_LOCK_ID = "lock_id"
+
+DEFAULT_DOMAIN = "euapi.ttlock.com"
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+STORAGE_VERSION = 1
+
+# Refresh the access token this many seconds before it actually expires.
+TOKEN_EXPIRY_BUFFER = 60
+
+# After a failed token refresh, wait this many seconds before trying again
+# so a bad password or an API outage does not hammer the OAuth endpoint.
+AUTH_FAILURE_BACKOFF = 300
+
+# The lock record list only feeds the last-entry attributes, so fetch it
+# once every this many polls rather than on every one.
+RECORD_POLL_INTERVAL = 10
+
+TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+_ENTRY_FMT = "%a, %d %b %Y %H:%M"
+
+# Open state reported by /v3/lock/queryOpenState.
+STATE_LOCKED = 0
+STATE_UNLOCKED = 1
+STATE_UNKNOWN = 2
+
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
+    {
+        vol.Required(CONF_CLIENT_ID): cv.string,
+        vol.Required(CONF_CLIENT_SECRET): cv.string,
+        vol.Required(CONF_USERNAME): cv.string,
+        vol.Required(CONF_PASSWORD): cv.string,
+        vol.Required(CONF_LOCK_ID): cv.positive_int,
+        vol.Optional(CONF_DOMAIN, default=DEFAULT_DOMAIN): cv.string,
+    }
+)
+
+
+def current_milli_time() -> int:
+    """Return the current time in milliseconds since the epoch."""
+    return time.time_ns() // 1_000_000
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    """Set up the TTLock platform."""
+    client_id = config[CONF_CLIENT_ID]
+    client_secret = config[CONF_CLIENT_SECRET]
+    username = config[CONF_USERNAME]
+    password = config[CONF_PASSWORD]
+    lock_id = config[CONF_LOCK_ID]
+    domain = config[CONF_DOMAIN]
+
+    # One coordinator per lock, shared if the same lock is configured twice,
+    # so each account/lock pair refreshes its token and polls only once.
+    coordinators: dict[tuple[str, int], TTLockCoordinator] = hass.data.setdefault(
+        DOMAIN, {}
+    )
+    if (coordinator := coordinators.get((client_id, lock_id))) is None:
+        session = async_get_clientsession(hass)
+
+        # Reuse a still-valid token persisted by an earlier run so a restart
+        # does not burn a fresh OAuth round-trip.
+        store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}_{lock_id}"
+        )
+        stored = await store.async_load()
+        now = time.time()
+        if stored and stored.get("expires_at", 0) - now > TOKEN_EXPIRY_BUFFER:
+            access_token: str = stored["access_token"]
+            expires_in = stored["expires_at"] - now
+        else:
+            async with session.post(
+                f"https://{domain}/oauth2/token",
+                data={
+                    "clientId": client_id,
+                    "clientSecret": client_secret,
+                    "username": username,
+                    "password": hashlib.md5(password.encode()).hexdigest(),
+                },
+                timeout=TIMEOUT,
+            ) as response:
+                body = await response.json(loads=json_loads) if response.ok else {}
+            if "access_token" not in body:
+                _LOGGER.error("Unable to authenticate with the TTLock API")
+                return
+            access_token = body["access_token"]
+            expires_in = body["expires_in"]
+            await store.async_save(
+                {"access_token": access_token, "expires_at": now + expires_in}
+            )
+
+        coordinator = TTLockCoordinator(
+            hass,
+            session,
+            domain,
+            client_id,
+            client_secret,
+            username,
+            password,
+            lock_id,
+            access_token,
+            expires_in,
+            store,
+        )
+        await coordinator.async_refresh()
+        if not coordinator.last_update_success:
+            raise PlatformNotReady
+        coordinators[(client_id, lock_id)] = coordinator
+
+    async_add_entities([TTLockDevice(coordinator)])
+
+
+class TTLockCoordinator(DataUpdateCoordinator[dict[str, Any]]):
+    """Manage the access token and poll the TTLock API for one lock."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        session: aiohttp.ClientSession,
+        domain: str,
+        client_id: str,
+        client_secret: str,
+        username: str,
+        password: str,
+        lock_id: int,
+        access_token: str,
+        expires_in: float,
+        store: Store[dict[str, Any]],
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"TTLock {lock_id}",
+            update_interval=SCAN_INTERVAL,
+        )
+        self._session = session
+        self._store = store
+        self._client_id = client_id
+        self._lock_id = lock_id
+        self._access_token = access_token
+
+        # The endpoint URLs and the token request body never change, so build
+        # them once instead of on every call.
+        self._base_url = f"https://{domain}"
+        self._token_url = f"{self._base_url}/oauth2/token"
+        self._lock_url = f"{self._base_url}/v3/lock/lock"
+        self._unlock_url = f"{self._base_url}/v3/lock/unlock"
+        self._detail_url = f"{self._base_url}/v3/lock/detail"
+        self._state_url = f"{self._base_url}/v3/lock/queryOpenState"
+        self._record_url = f"{self._base_url}/v3/lockRecord/list"
+        self._token_data = {
+            "clientId": client_id,
+            "clientSecret": client_secret,
+            "username": username,
+            "password": hashlib.md5(password.encode()).hexdigest(),
+        }
+        self._token_expires_at = time.monotonic() + expires_in - TOKEN_EXPIRY_BUFFER
+        self._auth_fail_until = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+        self._needs_state_refresh = True
+        self._record_poll_countdown = 0
+        self._last_entry_ms: int | None = None
+        # Mutated in place by _async_update_data so the entity's attribute
+        # property returns the same dict object instead of rebuilding it.
+        self._attrs: dict[str, Any] = {
+            ATTR_ALIAS: None,
+            ATTR_MODEL: None,
+            ATTR_SW_VERSION: None,
+            ATTR_BATTERY_LEVEL: None,
+            ATTR_AUTO_LOCK_TIME: None,
+            ATTR_PASSAGE_MODE: None,
+            ATTR_LOCK_SOUND: None,
+            ATTR_PRIVACY_LOCK: None,
+            ATTR_TAMPER_ALERT: None,
+            ATTR_RESET_BUTTON: None,
+            ATTR_LAST_USER: None,
+            ATTR_LAST_ENTRY_TIME: None,
+            ATTR_LOCK_ID: lock_id,
+        }
+
+    async def async_get_token(self, force: bool = False) -> None:
+        """Refresh the access token if it is about to expire."""
+        if not force and time.monotonic() < self._token_expires_at:
+            return
+
+        stale_token = self._access_token
+        async with self._refresh_lock:
+            # A concurrent caller may have refreshed while we waited.
+            if self._access_token != stale_token or (
+                not force and time.monotonic() < self._token_expires_at
+            ):
+                return
+            if time.monotonic() < self._auth_fail_until:
+                return
+
+            async with self._session.post(
+                self._token_url, data=self._token_data, timeout=TIMEOUT
+            ) as response:
+                body = await response.json(loads=json_loads) if response.ok else {}
+            if "access_token" in body:
+                self._access_token = body["access_token"]
+                self._token_expires_at = (
+                    time.monotonic() + body["expires_in"] - TOKEN_EXPIRY_BUFFER
+                )
+                self._auth_fail_until = 0.0
+                await self._store.async_save(
+                    {
+                        "access_token": self._access_token,
+                        "expires_at": time.time() + body["expires_in"],
+                    }
+                )
+            else:
+                self._auth_fail_until = time.monotonic() + AUTH_FAILURE_BACKOFF
+                _LOGGER.error(
+                    "Unable to refresh the TTLock access token, retrying in %s seconds",
+                    AUTH_FAILURE_BACKOFF,
+                )
+
+    async def _async_request(
+        self, method: str, url: str, extra: dict[str, Any] | None = None
+    ) -> dict[str, Any] | None:
+        """Issue an API request and return its parsed JSON payload.
+
+        Retries once with a forced token refresh on a 401 and returns None on
+        failure. Reading the body inside the context manager releases the
+        connection back to the shared pool.
+        """
+
+        def params() -> dict[str, Any]:
+            query: dict[str, Any] = {
+                "clientId": self._client_id,
+                "accessToken": self._access_token,
+                "lockId": self._lock_id,
+                "date": current_milli_time(),
+            }
+            if extra:
+                query.update(extra)
+            return query
+
+        response = await self._session.request(
+            method, url, params=params(), timeout=TIMEOUT
+        )
+        if response.status == 401:
+            response.release()
+            await self.async_get_token(force=True)
+            response = await self._session.request(
+                method, url, params=params(), timeout=TIMEOUT
+            )
+        async with response:
+            if not response.ok:
+                _LOGGER.debug(
+                    "TTLock API call %s returned status %s", url, response.status
+                )
+                return None
+            return await response.json(loads=json_loads)
+
+    async def async_lock(self) -> bool:
+        """Lock the device."""
+        await self.async_get_token()
+        if await self._async_request("POST", self._lock_url) is None:
+            return False
+        self._needs_state_refresh = True
+        if self.data:
+            self.data["state"] = STATE_LOCKED
+            self.async_update_listeners()
+        return True
+
+    async def async_unlock(self) -> bool:
+        """Unlock the device."""
+        await self.async_get_token()
+        if await self._async_request("POST", self._unlock_url) is None:
+            return False
+        self._needs_state_refresh = True
+        if self.data:
+            self.data["state"] = STATE_UNLOCKED
+            self.async_update_listeners()
+        return True
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        """Fetch the latest state of the lock from the TTLock API."""
+        await self.async_get_token()
+
+        # The open state only needs re-querying after a command (or while
+        # passage mode keeps the lock open), and the record list is rate
+        # limited; steady-state polls are a single detail GET.
+        poll_state = self._needs_state_refresh or self._attrs[ATTR_PASSAGE_MODE] == 1
+        poll_record = self._record_poll_countdown <= 0
+
+        calls = [self._async_request("GET", self._detail_url)]
+        if poll_state:
+            calls.append(self._async_request("GET", self._state_url))
+        if poll_record:
+            calls.append(
+                self._async_request(
+                    "GET", self._record_url, {"pageNo": 1, "pageSize": 1}
+                )
+            )
+
+        results = iter(await asyncio.gather(*calls))
+        data = next(results)
+        state_data = next(results) if poll_state else None
+        record_data = next(results) if poll_record else None
+
+        if data is None:
+            raise UpdateFailed("Lock detail request failed")
+
+        attrs = self._attrs
+        attrs[ATTR_ALIAS] = data["lockAlias"]
+        attrs[ATTR_MODEL] = data["modelNum"]
+        attrs[ATTR_SW_VERSION] = data["firmwareRevision"]
+        attrs[ATTR_BATTERY_LEVEL] = data["electricQuantity"]
+        attrs[ATTR_AUTO_LOCK_TIME] = data["autoLockTime"]
+        attrs[ATTR_PASSAGE_MODE] = data["passageMode"]
+        attrs[ATTR_LOCK_SOUND] = data["lockSound"]
+        attrs[ATTR_PRIVACY_LOCK] = data["privacyLock"]
+        attrs[ATTR_TAMPER_ALERT] = data["tamperAlert"]
+        attrs[ATTR_RESET_BUTTON] = data["resetButton"]
+
+        state = self.data["state"] if self.data else STATE_UNKNOWN
+        if state_data is not None:
+            state = state_data["state"]
+            self._needs_state_refresh = False
+
+        self._record_poll_countdown -= 1
+        if record_data is not None:
+            # The unconditional decrement above already counted this poll, so
+            # reset one short of the interval to fetch every Nth poll.
+            self._record_poll_countdown = RECORD_POLL_INTERVAL - 1
+            if record_data["list"]:
+                entry = record_data["list"][0]
+                attrs[ATTR_LAST_USER] = entry["username"]
+                entry_ms = int(entry["lockDate"])
+                # The newest record rarely changes between polls, so only
+                # reformat the timestamp when it does.
+                if entry_ms != self._last_entry_ms:
+                    self._last_entry_ms = entry_ms
+                    attrs[ATTR_LAST_ENTRY_TIME] = datetime.fromtimestamp(
+                        entry_ms / 1000
+                    ).strftime(_ENTRY_FMT)
+
+        return {"state": state, "attrs": attrs}
+
+
+class TTLockDevice(CoordinatorEntity[TTLockCoordinator], LockEntity):
+    """Representation of a TTLock lock."""
+
+    @property
+    def name(self) -> str | None:
+        """Return the name of the lock."""
+        return self.coordinator.data["attrs"][ATTR_ALIAS]
+
+    @property
+    def is_locked(self) -> bool:
+        """Return True if the lock is currently locked, else False."""
+        return self.coordinator.data["state"] == STATE_LOCKED
+
+    async def async_lock(self, **kwargs: Any) -> None:
+        """Lock the device."""
+        await self.coordinator.async_lock()
+
+    async def async_unlock(self, **kwargs: Any) -> None:
+        """Unlock the device."""
+        await self.coordinator.async_unlock()
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the state attributes."""
+        return self.coordinator.data["attrs"]